@@ -7,6 +7,8 @@ import os
 import sys
 import time
 import shutil
+import pickle
+from pathlib import Path
 #import warnings
 import numpy as np
 import pandas as pd
@@ -30,10 +32,106 @@ from .toolbox     import print_NoNewLine, print_color, deprecated, fact, epsilon
 from .toolbox_plotting import cmap_discrete, legend_translucent
 from .numeric_diag import bbq_hmt, make_dispersive
 
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None    # Only needed by Project_Info.save_to_disk / load_from_disk
+
 ### Definitions
 ureg  = UnitRegistry(system='mks')
 
 
+def _lazy_attr(name, factory):
+    '''
+    Property backed by `_name`, which is only built by `factory(self)` on first access.
+    '''
+    attr = '_' + name
+    def fget(self):
+        if getattr(self, attr) is None:
+            setattr(self, attr, factory(self))
+        return getattr(self, attr)
+    def fset(self, value):
+        setattr(self, attr, value)
+    return property(fget, fset)
+
+def _hfss_handle(name, invalidates_cache=False):
+    '''
+    Property backed by `_name`, for an HFSS handle of Project_Info.
+    Accessing it connects to HFSS, until connect_to_project() has once succeeded.
+    During connection, or once connected (e.g., after disconnect()), an unset handle raises.
+    If invalidates_cache, setting the handle calls invalidate_cache().
+    '''
+    attr = '_' + name
+    def fget(self):
+        if getattr(self, attr) is None and self._auto_connect and not self._connecting:
+            self.connect_to_project()
+        if getattr(self, attr) is None:
+            raise EnvironmentError("Project_Info is not connected to HFSS (no %s). Use connect_to_project()." % name)
+        return getattr(self, attr)
+    def fset(self, value):
+        if invalidates_cache:
+            self.invalidate_cache()
+        setattr(self, attr, value)
+    return property(fget, fset)
+
+_TABLE_RESERVED = ('__name__', '__keys__')
+
+def _to_arrow_array(values):
+    '''
+    Returns (pyarrow.Array of values, pickled). If Arrow cannot put the values
+    in one type (e.g., 50 and '50ohm'), they are stored pickled as binary instead.
+    '''
+    try:
+        return pyarrow.array(values), False
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, pyarrow.ArrowNotImplementedError):
+        return pyarrow.array([pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL) for v in values],
+                             pyarrow.binary()), True
+
+def _entries_to_table(entries):
+    '''
+    Arrow table of a dict of dicts (junctions or ports), one row per entry.
+    Columns are the union of the keys of all entries. Each row keeps its entry key in
+    `__name__` and its own keys, in order, in `__keys__`, so missing keys and key order
+    survive the round trip. Pickled columns are listed in the table metadata.
+    '''
+    fields = list(OrderedDict((k, None) for info in entries.values() for k in info))
+    assert all(isinstance(k, str) for k in fields), "Junction/port fields must be strings: %s" % fields
+    assert not set(fields) & set(_TABLE_RESERVED), "Junction/port fields may not be named %s" % (_TABLE_RESERVED,)
+
+    columns, pickled = OrderedDict(), []
+    for field in ('__name__',) + tuple(fields):
+        if field == '__name__':
+            values = list(entries)
+        else:
+            values = [info.get(field) for info in entries.values()]
+        columns[field], is_pickled = _to_arrow_array(values)
+        if is_pickled:
+            pickled.append(field)
+    columns['__keys__'] = pyarrow.array([list(info) for info in entries.values()], pyarrow.list_(pyarrow.string()))
+    if not entries:
+        columns['__name__'] = pyarrow.array([], pyarrow.string())
+
+    tbl = pyarrow.Table.from_pydict(columns)
+    return tbl.replace_schema_metadata({b'pyepr_pickled': pickle.dumps(pickled, protocol=2)})
+
+def _table_to_entries(tbl):
+    ''' Inverse of _entries_to_table. Returns an OrderedDict of dicts. '''
+    metadata = tbl.schema.metadata or {}
+    pickled  = pickle.loads(metadata[b'pyepr_pickled']) if b'pyepr_pickled' in metadata else []
+    load     = lambda k, v: pickle.loads(v) if k in pickled else v
+    entries  = OrderedDict()
+    for row in tbl.to_pylist():
+        entries[load('__name__', row['__name__'])] = OrderedDict((k, load(k, row[k])) for k in row['__keys__'])
+    return entries
+
+def _same_entries(a, b):
+    ''' a == b for two dicts of dicts, also treating NaN values as equal. '''
+    same = lambda x, y: (x is y) or (x == y) or (x != x and y != y)
+    return list(a) == list(b) and all(
+        list(a[n]) == list(b[n]) and all(same(a[n][k], b[n][k]) for k in a[n]) for n in a)
+
 class Project_Info(object):
     """
     Container for HFSS project info.
@@ -62,7 +160,8 @@ class Project_Info(object):
             Junciton rect. length, measured in meters.
     """
 
-    class _Dissipative:
+    class _Dissipative(object):
+        __slots__ = ('dielectrics_bulk', 'dielectric_surfaces', 'resistive_surfaces', 'seams')
         def __init__(self):
             self.dielectrics_bulk    = None
             self.dielectric_surfaces = None
@@ -98,77 +197,259 @@ class Project_Info(object):
             * Lj_variable -Name of junction inductance variables in HFSS. DO NOT USE Global names that start with $.
             * length - of Junciton rect. length, measured in meters.
         '''
-        self.project_path  = project_path
+        self.project_path  = project_path    # stored as a Path, see the property below
         self.project_name  = project_name
         self.design_name   = design_name
         self.setup_name    = None
 
         ## HFSS desgin: describe junction parameters
-        self.junctions     = OrderedDict()
-        self.ports         = OrderedDict()
+        ## Built on first access, see the properties below
+        self._junctions    = None
+        self._ports        = None
         # TODO: introduce modal labels
 
         ## Dissipative HFSS volumes and surfaces
-        self.dissipative   = self._Dissipative()
-        self.options       = self._pyEPR_Options()
-
-        # Conected to HFSS variable
-        self.app           = None
-        self.desktop       = None
-        self.project       = None
-        self.design        = None
-        self.setup         = None
-
-    _Forbidden = ['app', 'design', 'desktop', 'project',
-                  'dissipative', 'setup', '_Forbidden', 'junctions']
-    def save(self, hdf):
+        self._dissipative  = None
+        self._options      = None
+
+        # Conected to HFSS variable. Connects on first access
+        self._app          = None
+        self._desktop      = None
+        self._project      = None
+        self._design       = None
+        self._setup        = None
+        self._auto_connect = True            # Until connect_to_project() first succeeds
+        self._connecting   = False           # True while connect_to_project() runs
+
+        # Cached HFSS queries
+        self._all_variables_names = None
+        self._all_object_names    = None
+
+    junctions   = _lazy_attr('junctions',   lambda self: OrderedDict())
+    ports       = _lazy_attr('ports',       lambda self: OrderedDict())
+    dissipative = _lazy_attr('dissipative', lambda self: self._Dissipative())
+    options     = _lazy_attr('options',     lambda self: self._pyEPR_Options())
+
+    @property
+    def project_path(self):
+        ''' Directory of the project, as a str. Normalized once, when set (no trailing separator). '''
+        return self._project_path_str
+
+    @project_path.setter
+    def project_path(self, project_path):
+        self._project_path     = Path(project_path) if project_path else None
+        self._project_path_str = str(self._project_path) if self._project_path else None
+
+    app         = _hfss_handle('app')
+    desktop     = _hfss_handle('desktop')
+    project     = _hfss_handle('project', invalidates_cache=True)
+    design      = _hfss_handle('design',  invalidates_cache=True)
+    setup       = _hfss_handle('setup')
+
+    _Forbidden = frozenset(['app', 'design', 'desktop', 'project',
+                            'dissipative', 'setup', '_Forbidden', 'junctions'])
+    _Forbidden_pinfo = _Forbidden | frozenset(['options', 'ports'])  # saved under their own keys
+    def save(self, hdf=None):
+        '''
+        Returns the project info as a plain dict of dicts, with keys
+        'pinfo', 'dissip', 'options', 'junctions', 'ports'.
+
+            hdf : pd.HDFStore, optional
+                If given, the info is also written to it. Only then are
+                pandas objects built, since the store requires them.
+                As before, its 'project_info' also holds the options and ports.
+        '''
+        data = {'pinfo'     : get_instance_vars(self, self._Forbidden_pinfo),
+                'dissip'    : get_instance_vars(self.dissipative),
+                'options'   : get_instance_vars(self.options),
+                'junctions' : dict(self.junctions),
+                'ports'     : dict(self.ports)}
+
+        if hdf is not None:
+            hdf['project_info']           = pd.Series(get_instance_vars(self, self._Forbidden))
+            hdf['project_info_dissip']    = pd.Series(data['dissip'])
+            hdf['project_info_options']   = pd.Series(data['options'])
+            hdf['project_info_junctions'] = pd.DataFrame(data['junctions'])
+            hdf['project_info_ports']     = pd.DataFrame(data['ports'])
+
+        return data
+
+    _disk_formats = {'feather' : '.feather', 'parquet' : '.parquet'}
+    def save_to_disk(self, path, format='feather', compression='zstd'):
+        '''
+        Save the project info to the directory `path`, without going through pandas.
+        Requires pyarrow. Read back with Project_Info.load_from_disk.
+
+            path        : str
+                Directory to write to. Created if missing.
+            format      : 'feather' or 'parquet'
+                File format of the junctions and ports tables, one row per entry
+                (see _entries_to_table).
+            compression : str
+                Arrow compression codec of the tables, e.g. 'zstd', 'lz4', or None.
+
+        The remaining info (pinfo, dissip, options) is pickled to meta.pkl.
+        '''
+        assert pyarrow is not None, "Project_Info.save_to_disk requires pyarrow. Try: >> conda install -c conda-forge pyarrow"
+        assert format in self._disk_formats, "Unknown format %s, use one of %s" % (format, list(self._disk_formats))
+        ext  = self._disk_formats[format]
+        data = self.save()
+
+        # Convert everything before writing anything, so a failure leaves no partial files
+        tables = {key: _entries_to_table(data[key]) for key in ['junctions', 'ports']}
+        for key, tbl in tables.items():
+            if not _same_entries(data[key], _table_to_entries(tbl)):
+                raise ValueError("Project_Info.save_to_disk: the %s do not round trip through Arrow." % key)
+        meta   = pickle.dumps({key: data[key] for key in ['pinfo', 'dissip', 'options']},
+                              protocol=pickle.HIGHEST_PROTOCOL)
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        for key, tbl in tables.items():
+            filename = os.path.join(path, key + ext)
+            if format == 'feather':
+                pyarrow.feather.write_feather(tbl, filename, compression=compression)
+            else:
+                pyarrow.parquet.write_table(tbl, filename, compression=compression)
+        with open(os.path.join(path, 'meta.pkl'), 'wb') as f:  # last: marks a complete save
+            f.write(meta)
+
+    @classmethod
+    def load_from_disk(cls, path, format='feather'):
         '''
-            hdf : pd.HDFStore
+        Returns a new (unconnected) Project_Info from a directory written by save_to_disk.
         '''
-        hdf['project_info']           = pd.Series(get_instance_vars(self, self._Forbidden))
-        hdf['project_info_dissip']    = pd.Series(get_instance_vars(self.dissipative))
-        hdf['project_info_options']   = pd.Series(get_instance_vars(self.options))
-        hdf['project_info_junctions'] = pd.DataFrame(self.junctions)
-        hdf['project_info_ports']     = pd.DataFrame(self.ports)
+        assert pyarrow is not None, "Project_Info.load_from_disk requires pyarrow. Try: >> conda install -c conda-forge pyarrow"
+        assert format in cls._disk_formats, "Unknown format %s, use one of %s" % (format, list(cls._disk_formats))
+        ext = cls._disk_formats[format]
+
+        with open(os.path.join(path, 'meta.pkl'), 'rb') as f:
+            meta = pickle.load(f)
+        pinfo = cls(meta['pinfo']['project_path'])
+        for k, v in meta['pinfo'].items():
+            setattr(pinfo, k, v)
+        for k, v in meta['dissip'].items():
+            setattr(pinfo.dissipative, k, v)
+        for k, v in meta['options'].items():
+            setattr(pinfo.options, k, v)
+
+        for key in ['junctions', 'ports']:
+            filename = os.path.join(path, key + ext)
+            if format == 'feather':
+                tbl = pyarrow.feather.read_table(filename)
+            else:
+                tbl = pyarrow.parquet.read_table(filename)
+            setattr(pinfo, key, _table_to_entries(tbl))
+
+        return pinfo
 
 
     def connect_to_project(self):
         '''
         Connect to HFSS design.
         '''
-        print('\n\n\n')
-        #print('* '*40)
-        print('Connecting to HFSS ...')
+        self._connecting = True
+        try:
+            connection = self._connect_to_project()
+        finally:
+            self._connecting = False
+        self._auto_connect = False
+        return connection
+
+    def _connect_to_project(self):
+        print('\n\n\n\nConnecting to HFSS ...')
         assert self.project_path is not None
 
-        self.app, self.desktop, self.project = hfss.load_HFSS_project(self.project_name, self.project_path)
+        self.invalidate_cache()
+        app, desktop, project = hfss.load_HFSS_project(self.project_name, self._project_path)
+        if project is None:
+            raise EnvironmentError(' Failed to pull up the HFSS project. Is a project open?')
+        self.app, self.desktop, self.project = app, desktop, project
         try:
-            self.design  = self.project.get_design(self.design_name) if self.design_name != None else self.project.get_active_design()
+            design = project.get_design(self.design_name) if self.design_name != None else project.get_active_design()
+            self.design  = design
         except Exception as e:
             tb = sys.exc_info()[2]
             print("\n\nOriginal error:\n", e)
             raise(Exception(' Did you provide the correct design name? Failed to pull up design.').with_traceback(tb))
         try:
-            self.setup   = self.design.get_setup(name=self.setup_name)
+            setup = self.get_setup(self.setup_name)
         except Exception as e:
             tb = sys.exc_info()[2]
             print("\n\nOriginal error:\n", e)
             raise(Exception(' Did you provide the correct setup name? Failed to pull up setup.').with_traceback(tb))
 
-        self.project_name = self.project.name
-        self.design_name  = self.design.name
-        self.setup_name   = self.setup.name
+        self.project_name = project.name
+        self.project_path = project.get_path()
+        self.design_name  = design.name
+
+        print('\tDesign: %s [Solution type: %s]\n\tSetup : %s\n\tConnected successfully.\n\t :)\t :)\t :)\t\n'
+              % (self.design_name, design.solution_type, self.setup_name))
+        return app, desktop, project, design, setup
 
-        print('\tConnected successfully.\n\t :)\t :)\t :)\t\n')
-        return self.app, self.desktop, self.project, self.design, self.setup
+    def get_setup(self, name=None):
+        '''
+        Connect to the setup `name` of the current design (None: the first setup).
+        If that setup is already connected, it is returned without querying HFSS.
+        '''
+        if (self._setup is not None) and (name is not None) and (self._setup.name == name):
+            return self._setup
+        setup = self.design.get_setup(name=name)
+        if setup is None:
+            raise EnvironmentError("Setups of solution type %s are not supported." % self.design.solution_type)
+        self.setup      = setup
+        self.setup_name = setup.name
+        return setup
+
+    def get_all_variables_names(self):
+        """Returns tuple of all project and local design names. Cached; see invalidate_variables_cache()."""
+        if self._all_variables_names is None:
+            self._all_variables_names = tuple(self.project.get_variable_names()) + \
+                                        tuple(self.design.get_variable_names())
+        return self._all_variables_names
+
+    def invalidate_variables_cache(self):
+        """Call if project or design variables are created in HFSS after the names were fetched."""
+        self._all_variables_names = None
+
+    def get_all_object_names(self):
+        """Returns tuple of strings. Cached; see invalidate_object_names_cache()."""
+        if self._all_object_names is None:
+            self._all_object_names = tuple(self.design.modeler.get_all_object_names())
+        return self._all_object_names
+
+    def invalidate_object_names_cache(self):
+        """Call if objects are added or renamed in HFSS after the names were fetched."""
+        self._all_object_names = None
+
+    def invalidate_cache(self):
+        '''
+        Forget the connected setup and all cached HFSS query results.
+        Called when (re)connecting, on disconnect, and when project or design is set.
+        '''
+        self._setup = None
+        self.invalidate_variables_cache()
+        self.invalidate_object_names_cache()
+
+    def validate_junction_info(self):
+        """ Validate that the user has put in the junction info correctly.
+            Do no also forget to check the length of the rectangles/line of
+            the junction if you change it.
+        """
+        all_variables_names = frozenset(self.get_all_variables_names())
+        all_object_names    = frozenset(self.get_all_object_names())
+        for jjnm, jj in self.junctions.items():
+            assert jj['Lj_variable'] in all_variables_names, "pyEPR Project_Info user error found: Seems like for junction `%s` you specified a design or project variable for `Lj_variable` that does not exist in HFSS by the name: `%s` " % (jjnm, jj['Lj_variable'])
+            for name in ['rect', 'line']:
+                assert jj[name] in all_object_names, "pyEPR Project_Info user error found: Seems like for junction `%s` you specified a %s that does not exist in HFSS by the name: `%s` " % (jjnm, name, jj[name])
 
     def check_connected(self):
         return\
-        (self.setup   is not None) and\
-        (self.design  is not None) and\
-        (self.project is not None) and\
-        (self.desktop is not None) and\
-        (self.app     is not None)
+        (self._setup   is not None) and\
+        (self._design  is not None) and\
+        (self._project is not None) and\
+        (self._desktop is not None) and\
+        (self._app     is not None)
 
     def disconnect(self):
         '''
@@ -179,6 +460,7 @@ class Project_Info(object):
         self.desktop.release()
         self.app.release()
         hfss.release()
+        self.invalidate_cache()
 
 
 
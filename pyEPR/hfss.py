@@ -25,6 +25,10 @@ from win32com.client import Dispatch, CDispatch
 ureg = UnitRegistry()
 Q    = ureg.Quantity
 
+# COM errors raised when calling a method the object does not have
+_DISP_E_NOT_FOUND = (-2147352573,  # DISP_E_MEMBERNOTFOUND
+                     -2147352570)  # DISP_E_UNKNOWNNAME
+
 BASIS_ORDER = {"Zero Order": 0,
                "First Order": 1,
                "Second Order": 2,
@@ -1053,6 +1057,32 @@ class HfssModeler(COMWrapper):
     def get_face_ids(self, obj):
         return self. _modeler.GetFaceIDs(obj)
 
+    def get_objects_in_group(self, group):
+        """
+        Use: Returns the objects for the specified group.
+        Parameters: <groupName>    Type: <string>
+                    One of <materialName>, <assignmentName>, "Non Model",
+                    "Solids", "Unclassified", "Sheets", "Lines"
+        """
+        return list(self._modeler.GetObjectsInGroup(group))
+
+    _object_groups = ["Non Model", "Solids", "Unclassified", "Sheets", "Lines"]
+    def get_all_object_names(self):
+        """
+        Returns the names of all objects in the modeler, from a single COM call.
+        Falls back to querying each object group in turn, only if the modeler
+        does not provide GetMatchedObjectName.
+        """
+        try:
+            return list(self._modeler.GetMatchedObjectName("*"))
+        except (AttributeError, pythoncom.com_error) as e:
+            if isinstance(e, pythoncom.com_error) and e.hresult not in _DISP_E_NOT_FOUND:
+                raise
+            objects = []
+            for group in self._object_groups:
+                objects += self.get_objects_in_group(group)
+            return objects
+
     def eval_expr(self, expr, units="mm"):
         if not isinstance(expr, str):
             return expr
@@ -1394,7 +1424,7 @@ def load_HFSS_project(proj_name, project_path, extension = '.aedt'):  # aedt is
     # Checks
     assert os.path.isdir(project_path),   "ERROR! project_path is not a valid directory. Check the path, and especially \\ charecters."
 
-    project_path +=  proj_name + extension
+    project_path = os.path.join(project_path, proj_name + extension)  # project_path may lack the trailing separator
 
     if os.path.isfile(project_path):
         print('\tFile path to HFSS project found.')
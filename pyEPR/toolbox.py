@@ -78,13 +78,25 @@ def sort_Series_idx(sr):
 
 
 
-def get_instance_vars(obj, Forbidden=[]):
+_class_var_names = {}  # class -> public, non-callable class attributes (properties, slots)
+def _get_class_var_names(cls):
+    if cls not in _class_var_names:
+        _class_var_names[cls] = frozenset(v for v in dir(cls)
+                                          if not v.startswith('_') and not callable(getattr(cls, v)))
+    return _class_var_names[cls]
+
+def get_instance_vars(obj, Forbidden=frozenset()):
+    '''
+    Returns dict of the public, non-callable attributes of obj, except those in Forbidden.
+    The class attributes are only looked up once per class.
+    '''
+    names = set(_get_class_var_names(type(obj)))
+    names.update(v for v in getattr(obj, '__dict__', ()) if not v.startswith('_'))
     VARS = {}
-    for v in dir(obj):
-        if not ((v.startswith('__')) or (v.startswith('_'))):
-            if not callable(getattr(obj,v)):
-                if not (v in Forbidden):
-                    VARS[v] = getattr(obj,v)
+    for v in sorted(names.difference(Forbidden)):  # before getattr: do not trigger lazy properties
+        value = getattr(obj, v)
+        if not callable(value):
+            VARS[v] = value
     return VARS
 
 